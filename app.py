@@ -1,5 +1,7 @@
-from flask import Flask, request, jsonify, send_file
-from laundry_optimizer_final import gpt_optimize_handler, CATALOG
+from flask import Flask, request, jsonify, send_file, redirect, Response
+from laundry_optimizer_final import gpt_optimize_handler, optimize_items, format_response, LaundryOptimizer, CATALOG
+from solver_pool import SolverPool
+from logging_pipeline import setup_logging, bind_request, bind_receipt, get_correlation_id, logging_stats
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib import colors
@@ -7,6 +9,11 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import Paragraph, Table, TableStyle
 from reportlab.lib.units import mm
 from datetime import datetime
+from functools import lru_cache
+from urllib.parse import urlencode
+import gzip
+import hashlib
+import json
 import tempfile
 import logging
 import os
@@ -16,22 +23,37 @@ import threading
 import time
 from pathlib import Path
 
+# Brotli é opcional; sem ele a compressão fica só em gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 app = Flask(__name__)
 CORS(app, origins=["https://chat.openai.com"])
 
+# Os processos do pool de solvers (spawn) reimportam este módulo como
+# __mp_main__ quando a app corre com "python app.py"; nesse caso não há
+# logging, threads nem pool a iniciar
+IS_SOLVER_PROCESS = __name__ == '__mp_main__'
+
+# Configuração de logging (fila assíncrona, registos JSON)
+if not IS_SOLVER_PROCESS:
+    setup_logging(
+        level=logging.INFO,
+        info_sample_rate=float(os.environ.get('LOG_INFO_SAMPLE_RATE', 1.0))
+    )
+app.logger.setLevel(logging.INFO)
+
 # Configurações de caminho
 BASE_DIR = Path(__file__).parent.resolve()
 LOGO_PATH = BASE_DIR / "logo.png"
 
 # Verificar existência do logo
 if not LOGO_PATH.exists():
-    app.logger.error(f"Arquivo de logo não encontrado: {LOGO_PATH}")
+    app.logger.error("Arquivo de logo não encontrado: %s", LOGO_PATH)
     LOGO_PATH = None
 
-# Configuração de logging
-logging.basicConfig(level=logging.INFO)
-app.logger.setLevel(logging.INFO)
-
 # Lista de chaves válidas
 VALID_KEYS = {
     "peca_variada", "camisa", "vestido_simples",
@@ -40,6 +62,32 @@ VALID_KEYS = {
     "vestido_noiva", "casaco_sobretudo", "blusao_almofadado", "blusao_penas"
 }
 
+# Pool de solvers persistentes (desativado se SOLVER_POOL_WORKERS=0)
+SOLVER_POOL_WORKERS = 0 if IS_SOLVER_PROCESS else int(os.environ.get('SOLVER_POOL_WORKERS', 0))
+solver_pool = SolverPool(workers=SOLVER_POOL_WORKERS, logger=app.logger) if SOLVER_POOL_WORKERS > 0 else None
+
+def warm_up_solver_pool():
+    """Arranca os workers do pool antes do primeiro pedido deste processo"""
+    if solver_pool is None:
+        return
+    try:
+        solver_pool.warm_up()
+        app.logger.info("Pool de solvers pronto (%d workers)", solver_pool.workers)
+    except Exception:
+        app.logger.exception("Falha ao aquecer o pool de solvers")
+
+# Versão do catálogo (entra nas ETags; muda sempre que os preços mudam)
+CATALOG_VERSION = hashlib.sha256(
+    json.dumps(CATALOG, sort_keys=True).encode()
+).hexdigest()[:16]
+
+# Backend que calcula os orçamentos (entra nas ETags do /quote): solvers
+# diferentes podem escolher packs diferentes com o mesmo custo
+QUOTE_SOLVER = solver_pool.solver_name if solver_pool else "PULP_CBC_CMD"
+
+# Tempo de cache HTTP (segundos) para /quote e /catalog
+HTTP_CACHE_MAX_AGE = int(os.environ.get('HTTP_CACHE_MAX_AGE', 3600))
+
 # Cache para armazenar resultados
 result_cache = {}
 cache_lock = threading.Lock()
@@ -57,8 +105,15 @@ def clean_cache():
             result_cache = {k: v for k, v in result_cache.items() if now - v['timestamp'] < 1800}
 
 # Inicia thread de limpeza
-cache_cleaner = threading.Thread(target=clean_cache, daemon=True)
-cache_cleaner.start()
+if not IS_SOLVER_PROCESS:
+    cache_cleaner = threading.Thread(target=clean_cache, daemon=True)
+    cache_cleaner.start()
+
+# Importado por um worker (ex.: "gunicorn app:app"): aquecer já o pool.
+# Com "python app.py" o aquecimento é feito no arranque de cada worker
+# (post_fork) ou antes do servidor de desenvolvimento, nunca no master.
+if __name__ not in ('__main__', '__mp_main__'):
+    warm_up_solver_pool()
 
 # ========================================================================== #
 #  NOVAS FUNÇÕES PARA PDF DINÂMICO
@@ -280,11 +335,114 @@ def generate_receipt_pdf(resultado, cliente_nome=""):
             return filename
             
     except Exception as e:
-        app.logger.error(f"Erro ao gerar PDF: {str(e)}")
-        import traceback
-        app.logger.error(traceback.format_exc())
+        app.logger.exception("Erro ao gerar PDF: %s", e)
         raise
 
+# ========================================================================== #
+#  VALIDAÇÃO DE PEDIDOS
+# ========================================================================== #
+def parse_items(items):
+    """Valida os itens e converte as quantidades para inteiros"""
+    if not items or not isinstance(items, dict):
+        raise ValueError("Formato inválido: esperado objeto com itens")
+
+    clean_items = {}
+    for item, qty in items.items():
+        if item not in VALID_KEYS:
+            raise ValueError(f"Item desconhecido: '{item}'. Itens válidos: {', '.join(VALID_KEYS)}")
+            
+        try:
+            clean_qty = int(qty)
+            if clean_qty < 0:
+                raise ValueError(f"Quantidade negativa para '{item}': {qty}")
+            clean_items[item] = clean_qty
+        except (TypeError, ValueError):
+            raise ValueError(f"Quantidade inválida para '{item}': {qty} - deve ser número inteiro")
+    return clean_items
+
+# ========================================================================== #
+#  CACHE HTTP (ETAG, 304 E COMPRESSÃO)
+# ========================================================================== #
+def negotiate_encoding():
+    """Escolhe a codificação preferida pelo cliente (br > gzip > nenhuma)"""
+    if brotli is not None and request.accept_encodings['br']:
+        return 'br'
+    if request.accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+def encode_body(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body)
+    if encoding == 'gzip':
+        return gzip.compress(body, mtime=0)  # mtime fixo: bytes estáveis por ETag
+    return body
+
+def make_etag(*parts):
+    """ETag forte derivada da versão do catálogo e do conteúdo pedido"""
+    digest = hashlib.sha256("|".join((CATALOG_VERSION,) + parts).encode()).hexdigest()
+    return digest[:32]
+
+def cacheable_response(tag, get_body, encoding):
+    """Responde 304 se o cliente já tem a versão; caso contrário envia o corpo codificado"""
+    # Cada codificação é uma representação distinta, logo tem ETag própria
+    etag = f"{tag}-{encoding}" if encoding else tag
+
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = Response(get_body(encoding), mimetype='application/json')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f"public, max-age={HTTP_CACHE_MAX_AGE}"
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+@lru_cache(maxsize=4096)
+def quote_body(order_key):
+    """Orçamento serializado para um vetor de pedido canónico (sem recibo)"""
+    # Erros do solver propagam-se (e não ficam em cache)
+    total, detalhes, _ = optimize_items(dict(order_key), solver_pool)
+    resultado = format_response(total, detalhes)
+    resultado["versao_catalogo"] = CATALOG_VERSION
+    return json.dumps(resultado, ensure_ascii=False, sort_keys=True).encode()
+
+@lru_cache(maxsize=8192)
+def encoded_quote_body(order_key, encoding):
+    return encode_body(quote_body(order_key), encoding)
+
+@lru_cache(maxsize=4)
+def encoded_catalog_body(encoding):
+    body = json.dumps(
+        {"versao_catalogo": CATALOG_VERSION, "catalogo": CATALOG},
+        ensure_ascii=False, sort_keys=True
+    ).encode()
+    return encode_body(body, encoding)
+
+# ========================================================================== #
+#  ID DE CORRELAÇÃO POR PEDIDO
+# ========================================================================== #
+@app.before_request
+def bind_correlation_id():
+    bind_request(request.headers.get('X-Request-ID') or uuid.uuid4().hex)
+
+@app.after_request
+def add_correlation_header(response):
+    correlation_id = get_correlation_id()
+    # Respostas públicas (/quote, /catalog, incluindo 304 e 301) ficam em
+    # CDNs; o ID de correlação de um cliente não pode ser servido aos outros
+    if correlation_id and not response.cache_control.public:
+        response.headers['X-Request-ID'] = correlation_id
+    return response
+
+@app.teardown_request
+def clear_correlation_id(exc):
+    # O thread do servidor é reutilizado; registos fora de pedidos
+    # (ex.: arranque e aquecimento do pool) não devem herdar o contexto
+    bind_request(None)
+
 # ========================================================================== #
 #  ENDPOINTS DA API
 # ========================================================================== #
@@ -298,6 +456,8 @@ def home():
         "endpoints": {
             "optimize": "/optimize (POST)",
             "download_pdf": "/download_pdf/<receipt_id> (GET)",
+            "quote": "/quote?camisa=8&peca_variada=15 (GET)",
+            "catalog": "/catalog (GET)",
             "health": "/health (GET)"
         },
         "mensagem": "Envie um POST para /optimize com os itens de lavanderia"
@@ -326,23 +486,12 @@ def optimize():
         cliente_nome = data.get('cliente', '').strip()
             
         # Converter valores para inteiros e validar
-        clean_items = {}
-        for item, qty in items.items():
-            if item not in VALID_KEYS:
-                raise ValueError(f"Item desconhecido: '{item}'. Itens válidos: {', '.join(VALID_KEYS)}")
-                
-            try:
-                clean_qty = int(qty)
-                if clean_qty < 0:
-                    raise ValueError(f"Quantidade negativa para '{item}': {qty}")
-                clean_items[item] = clean_qty
-            except (TypeError, ValueError):
-                raise ValueError(f"Quantidade inválida para '{item}': {qty} - deve ser número inteiro")
+        clean_items = parse_items(items)
 
-        app.logger.info(f"Pedido validado: {clean_items}")
+        app.logger.info("Pedido validado: %s", clean_items)
 
     except Exception as e:
-        app.logger.error(f"Erro na validação: {str(e)}")
+        app.logger.error("Erro na validação: %s", e)
         return jsonify({
             "status": "erro",
             "mensagem": str(e)
@@ -351,16 +500,18 @@ def optimize():
     # 2. Processar otimização usando o handler do ChatGPT
     try:
         app.logger.info("Iniciando otimização...")
-        response = gpt_optimize_handler(clean_items)
+        response = gpt_optimize_handler(clean_items, solver_pool)
         
         # Gerar ID único para o resultado
         receipt_id = str(uuid.uuid4())
+        bind_receipt(receipt_id)
         
         # Armazenar resultado no cache
         with cache_lock:
             result_cache[receipt_id] = {
                 "result": response,
                 "cliente": cliente_nome,  # Armazenar nome do cliente
+                "correlation_id": get_correlation_id(),  # Liga o /download_pdf a este pedido
                 "timestamp": time.time()
             }
         
@@ -378,6 +529,49 @@ def optimize():
             "mensagem": f"Erro interno no servidor: {str(e)}"
         }), 500
 
+@app.route('/quote', methods=['GET'])
+def quote():
+    """Orçamento só de leitura, cacheável por CDNs e clientes (não gera recibo)"""
+    try:
+        if any(len(values) > 1 for values in request.args.listvalues()):
+            raise ValueError("Item repetido na query string")
+
+        # Forma canónica: itens ordenados, inteiros normalizados, sem zeros
+        clean_items = parse_items(request.args.to_dict())
+        order_key = tuple(sorted((k, v) for k, v in clean_items.items() if v > 0))
+        if not order_key:
+            raise ValueError("Pedido vazio: indique pelo menos um item")
+        LaundryOptimizer().check_capacity(clean_items)
+    except ValueError as e:
+        return jsonify({"status": "erro", "mensagem": str(e)}), 400
+
+    # Redirecionar variantes para o URL canónico (uma entrada por pedido na CDN)
+    canonical = urlencode(order_key)
+    if request.query_string.decode() != canonical:
+        response = redirect(f"/quote?{canonical}", code=301)
+        response.headers['Cache-Control'] = f"public, max-age={HTTP_CACHE_MAX_AGE}"
+        return response
+
+    try:
+        encoding = negotiate_encoding()
+        return cacheable_response(
+            make_etag("quote", QUOTE_SOLVER, canonical),
+            lambda enc: encoded_quote_body(order_key, enc),
+            encoding
+        )
+    except Exception as e:
+        # Entrada já validada: aqui só falham o solver ou o pool (timeout, pool partido)
+        app.logger.exception("Erro no orçamento")
+        return jsonify({
+            "status": "erro",
+            "mensagem": f"Erro interno no servidor: {str(e)}"
+        }), 500
+
+@app.route('/catalog', methods=['GET'])
+def catalog():
+    """Catálogo de preços atual com a respetiva versão"""
+    return cacheable_response(make_etag("catalog"), encoded_catalog_body, negotiate_encoding())
+
 @app.route('/download_pdf/<receipt_id>', methods=['GET'])
 def download_pdf(receipt_id):
     """Endpoint GET para download direto do PDF"""
@@ -392,6 +586,12 @@ def download_pdf(receipt_id):
                 
             resultado = result_cache[receipt_id]["result"]
             cliente_nome = result_cache[receipt_id]["cliente"]
+            correlation_id = result_cache[receipt_id].get("correlation_id")
+        
+        # O pedido mantém o seu ID de correlação; o do /optimize que gerou
+        # o recibo fica num campo próprio
+        bind_receipt(receipt_id)
+        app.logger.info("Gerando PDF do recibo", extra={"optimize_correlation_id": correlation_id})
         
         # Gerar PDF com nome do cliente
         filename = generate_receipt_pdf(resultado, cliente_nome)
@@ -404,6 +604,7 @@ def download_pdf(receipt_id):
         )
             
     except Exception as e:
+        app.logger.exception("Erro no download do PDF")
         return jsonify({"status": "erro", "mensagem": str(e)}), 500
 
 @app.route('/health', methods=['GET'])
@@ -412,7 +613,9 @@ def health_check():
     return jsonify({
         "status": "online",
         "versao": "2.0.1",
-        "mensagem": "API com PDF dinâmico A4 e suporte a cliente"
+        "mensagem": "API com PDF dinâmico A4 e suporte a cliente",
+        "solver": solver_pool.stats() if solver_pool else {"backend": "PULP_CBC_CMD", "pool": False},
+        "logging": logging_stats()
     })
 
 # ========================================================================== #
@@ -440,17 +643,20 @@ if __name__ == '__main__':
             options = {
                 'bind': f'0.0.0.0:{port}',
                 'workers': 4,
-                'timeout': 120
+                'timeout': 120,
+                'post_fork': lambda server, worker: warm_up_solver_pool()
             }
-            app.logger.info(f"Iniciando servidor Gunicorn na porta {port}")
+            app.logger.info("Iniciando servidor Gunicorn na porta %d", port)
             FlaskApplication(app, options).run()
             
         except ImportError:
             # Fallback para Waitress se Gunicorn não estiver disponível
             from waitress import serve
-            app.logger.info(f"Iniciando servidor Waitress na porta {port}")
+            warm_up_solver_pool()
+            app.logger.info("Iniciando servidor Waitress na porta %d", port)
             serve(app, host='0.0.0.0', port=port)
     else:
         # Modo de desenvolvimento
-        app.logger.info(f"Iniciando servidor de desenvolvimento na porta {port}")
+        warm_up_solver_pool()
+        app.logger.info("Iniciando servidor de desenvolvimento na porta %d", port)
         app.run(host='0.0.0.0', port=port)
\ No newline at end of file
@@ -9,7 +9,7 @@ Requer: pulp (pip install pulp)
 
 from __future__ import annotations
 from typing import Dict, Tuple, Any
-from pulp import LpProblem, LpMinimize, LpInteger, LpVariable, lpSum, LpStatus
+from pulp import LpProblem, LpMinimize, LpInteger, LpVariable, lpSum, LpStatus, getSolver
 import json
 import logging
 import numpy as np
@@ -48,6 +48,96 @@ CATALOG = {
     }
 }
 
+# --------------------------------------------------------------------------- #
+#  MODELO MILP REUTILIZÁVEL
+# --------------------------------------------------------------------------- #
+class LaundryModel:
+    """Modelo MILP construído uma vez; entre pedidos só mudam os lados direitos."""
+
+    def __init__(self, catalog: dict = CATALOG):
+        self.catalog = catalog
+        self.prob = LpProblem("Minimizar_Custo_Lavanderia", LpMinimize)
+
+        # Variáveis de decisão
+        self.x = {
+            p["tipo"]: LpVariable(f"pack_misto_{p['tipo']}", 0, cat=LpInteger)
+            for p in catalog["packs_mistos"]
+        }
+        self.s = {
+            p["tipo"]: LpVariable(f"camisas_no_misto_{p['tipo']}", 0, cat=LpInteger)
+            for p in catalog["packs_mistos"]
+        }
+        self.y = {
+            p["tipo"]: LpVariable(f"pack_camisa_{p['tipo']}", 0, cat=LpInteger)
+            for p in catalog["packs_camisas"]
+        }
+        self.a_var = LpVariable("pecas_variadas_avulsas", 0, cat=LpInteger)
+        self.a_cam = LpVariable("camisas_avulsas", 0, cat=LpInteger)
+
+        self.cost_mistos = lpSum(p["preco"] * self.x[p["tipo"]] for p in catalog["packs_mistos"])
+        self.cost_camisas = lpSum(p["preco"] * self.y[p["tipo"]] for p in catalog["packs_camisas"])
+
+        self.cost_avulso = (
+            catalog["avulso"]["peca_variada"] * self.a_var +
+            catalog["avulso"]["camisa"] * self.a_cam
+        )
+
+        self.prob += self.cost_mistos + self.cost_camisas + self.cost_avulso
+
+        # Limite de camisas nos packs mistos
+        for p in catalog["packs_mistos"]:
+            self.prob += self.s[p["tipo"]] <= p["limite_camisas"] * self.x[p["tipo"]]
+            self.prob += self.s[p["tipo"]] >= 0
+
+        # Cobertura de camisas (lado direito definido em solve)
+        self.prob += (
+            lpSum(self.s.values()) +
+            lpSum(p["capacidade"] * self.y[p["tipo"]] for p in catalog["packs_camisas"]) +
+            self.a_cam >= 0,
+            "cobertura_camisas"
+        )
+
+        # Cobertura de peças variadas (lado direito definido em solve)
+        self.prob += (
+            lpSum(
+                (p["capacidade"] * self.x[p["tipo"]]) - self.s[p["tipo"]]
+                for p in catalog["packs_mistos"]
+            ) + self.a_var >= 0,
+            "cobertura_pecas_variadas"
+        )
+
+    def set_quantities(self, qty: Dict[str, int]) -> None:
+        """Atualiza os lados direitos das restrições de cobertura."""
+        # O PuLP guarda "expr >= rhs" como "expr - rhs >= 0"
+        self.prob.constraints["cobertura_camisas"].constant = -qty["camisa"]
+        self.prob.constraints["cobertura_pecas_variadas"].constant = -qty["peca_variada"]
+
+    def solve(self, qty: Dict[str, int], solver: Any = None) -> None:
+        """Resolve o modelo para as quantidades dadas."""
+        self.set_quantities(qty)
+        # Sem msg=False o CBC escreve o log dele no stdout do processo
+        if solver is None:
+            solver = "PULP_CBC_CMD"
+        if isinstance(solver, str):
+            solver = getSolver(solver, msg=False)
+        status = self.prob.solve(solver)
+        if LpStatus[status] != "Optimal":
+            raise RuntimeError(f"Erro no solver: {LpStatus[status]}")
+
+    def solution(self) -> Dict[str, Any] | None:
+        """Valores da última solução (None se o solver não devolveu valores)."""
+        variables = {v.name: v.value() for v in self.prob.variables()}
+        if any(value is None for value in variables.values()):
+            return None
+        return {
+            "x": {k: v.value() for k, v in self.x.items()},
+            "s": {k: v.value() for k, v in self.s.items()},
+            "y": {k: v.value() for k, v in self.y.items()},
+            "a_var": self.a_var.value(),
+            "a_cam": self.a_cam.value(),
+            "variables": variables
+        }
+
 # --------------------------------------------------------------------------- #
 #  NÚCLEO DE OTIMIZAÇÃO
 # --------------------------------------------------------------------------- #
@@ -72,14 +162,15 @@ class LaundryOptimizer:
     def optimize_order(
         self,
         items: Dict[str, int],
-        solver_name: str | None = None
+        solver_name: Any = None,
+        template: Any = None
     ) -> Tuple[float, Dict[str, Any], Dict[str, Any]]:
         order = {k: int(items.get(k, 0)) for k in self._ITEM_KEYS}
         invalid = [k for k in items if k not in order]
         if invalid:
             raise ValueError(f"Itens desconhecidos: {invalid}")
 
-        self.log.info("Processando pedido: %s", order)
+        self.log.debug("Processando pedido: %s", order)
 
         # Validação de pedido vazio
         if all(qty == 0 for qty in order.values()):
@@ -104,89 +195,46 @@ class LaundryOptimizer:
                 if k in self._SPECIALS and v > 0
             }}, {}
 
-        # Calcular capacidade total disponível
-        total_capacity = sum(
-            p["capacidade"] * 10  # Considerar 10x a capacidade máxima
-            for p in self.catalog["packs_mistos"]
-        )
-        total_capacity += sum(
-            p["capacidade"] * 10
-            for p in self.catalog["packs_camisas"]
-        )
-        
         # Verificar viabilidade
-        total_items = qty["peca_variada"] + qty["camisa"]
-        if total_items > total_capacity:
-            raise ValueError(f"Pedido muito grande ({total_items} itens). Capacidade máxima: {total_capacity}")
+        self.check_capacity(qty)
 
-        prob = LpProblem("Minimizar_Custo_Lavanderia", LpMinimize)
+        # Reutilizar o modelo pré-construído quando fornecido
+        # (LaundryModel ou qualquer objeto com solve() e solution())
+        model = template or LaundryModel(self.catalog)
+        model.solve(qty, solver_name)
 
-        # Variáveis de decisão
-        x = {
-            p["tipo"]: LpVariable(f"pack_misto_{p['tipo']}", 0, cat=LpInteger)
-            for p in self.catalog["packs_mistos"]
-        }
-        s = {
-            p["tipo"]: LpVariable(f"camisas_no_misto_{p['tipo']}", 0, cat=LpInteger)
-            for p in self.catalog["packs_mistos"]
-        }
-        y = {
-            p["tipo"]: LpVariable(f"pack_camisa_{p['tipo']}", 0, cat=LpInteger)
-            for p in self.catalog["packs_camisas"]
-        }
-        a_var = LpVariable("pecas_variadas_avulsas", 0, cat=LpInteger)
-        a_cam = LpVariable("camisas_avulsas", 0, cat=LpInteger)
+        # Verificar valores inválidos do solver
+        sol = model.solution()
+        if sol is None:
+            self.log.error("Solver retornou valores inválidos")
+            raise RuntimeError("Solução inválida do solver")
 
-        cost_mistos = lpSum(p["preco"] * x[p["tipo"]] for p in self.catalog["packs_mistos"])
-        cost_camisas = lpSum(p["preco"] * y[p["tipo"]] for p in self.catalog["packs_camisas"])
-        
+        # Arredondar (não truncar): alguns solvers devolvem 0.9999999 para 1
+        x = {k: int(round(v)) for k, v in sol["x"].items()}
+        y = {k: int(round(v)) for k, v in sol["y"].items()}
+        packs_mistos = {k: v for k, v in x.items() if v > 0}
+        packs_camisas = {k: v for k, v in y.items() if v > 0}
+
+        # Com os packs escolhidos, as camisas são distribuídas de forma canónica
+        # (solvers diferentes devolvem distribuições diferentes com o mesmo custo)
+        s, a_var, a_cam = self._fill_packs(qty, x, y)
+        avulsos = {"peca_variada": a_var, "camisa": a_cam}
+        camisas_em_mistos = {k: v for k, v in s.items() if v > 0}
+
+        variables = dict(sol["variables"])
+        for k, v in s.items():
+            variables[f"camisas_no_misto_{k}"] = v
+        variables["pecas_variadas_avulsas"] = a_var
+        variables["camisas_avulsas"] = a_cam
+
+        cost_mistos = sum(p["preco"] * x[p["tipo"]] for p in self.catalog["packs_mistos"])
+        cost_camisas = sum(p["preco"] * y[p["tipo"]] for p in self.catalog["packs_camisas"])
         cost_avulso = (
             self.catalog["avulso"]["peca_variada"] * a_var +
             self.catalog["avulso"]["camisa"] * a_cam
         )
 
-        prob += cost_mistos + cost_camisas + cost_avulso
-
-        # Limite de camisas nos packs mistos
-        for p in self.catalog["packs_mistos"]:
-            prob += s[p["tipo"]] <= p["limite_camisas"] * x[p["tipo"]]
-            prob += s[p["tipo"]] >= 0
-
-        # Cobertura de camisas
-        prob += (
-            lpSum(s.values()) + 
-            lpSum(p["capacidade"] * y[p["tipo"]] for p in self.catalog["packs_camisas"]) + 
-            a_cam >= qty["camisa"]
-        )
-
-        # Cobertura de peças variadas
-        prob += (
-            lpSum(
-                (p["capacidade"] * x[p["tipo"]]) - s[p["tipo"]] 
-                for p in self.catalog["packs_mistos"]
-            ) + a_var >= qty["peca_variada"]
-        )
-
-        status = prob.solve(solver_name)
-        if LpStatus[status] != "Optimal":
-            raise RuntimeError(f"Erro no solver: {LpStatus[status]}")
-
-        # Verificar valores inválidos do solver
-        if any(var.value() is None for var in prob.variables()):
-            self.log.error("Solver retornou valores inválidos")
-            raise RuntimeError("Solução inválida do solver")
-
-        packs_mistos = {k: int(v.value()) for k, v in x.items() if v.value() > 0}
-        packs_camisas = {k: int(v.value()) for k, v in y.items() if v.value() > 0}
-        
-        avulsos = {
-            "peca_variada": int(a_var.value()),
-            "camisa": int(a_cam.value()),
-        }
-
-        camisas_em_mistos = {k: int(v.value()) for k, v in s.items() if v.value() > 0}
-
-        var_cost = prob.objective.value()
+        var_cost = cost_mistos + cost_camisas + cost_avulso
         total_cost = round(fixed_cost + var_cost, 2)
 
         # Função para converter tipos numpy para tipos nativos serializáveis
@@ -200,9 +248,9 @@ class LaundryOptimizer:
         # Converter todos os valores no breakdown
         detalhe_custos = {
             "custos_fixos": convert_value(fixed_cost),
-            "packs_mistos": convert_value(cost_mistos.value()),
-            "packs_camisas": convert_value(cost_camisas.value()),
-            "itens_avulsos": convert_value(cost_avulso.value()),
+            "packs_mistos": convert_value(cost_mistos),
+            "packs_camisas": convert_value(cost_camisas),
+            "itens_avulsos": convert_value(cost_avulso),
             "total_variavel": convert_value(var_cost),
             "total": convert_value(total_cost)
         }
@@ -216,7 +264,63 @@ class LaundryOptimizer:
             "detalhe_custos": detalhe_custos
         }
 
-        return total_cost, breakdown, {v.name: v.value() for v in prob.variables()}
+        return total_cost, breakdown, variables
+
+    def check_capacity(self, qty: Dict[str, int]) -> None:
+        """Rejeita pedidos acima da capacidade total (antes de chamar o solver)."""
+        # Calcular capacidade total disponível
+        total_capacity = sum(
+            p["capacidade"] * 10  # Considerar 10x a capacidade máxima
+            for p in self.catalog["packs_mistos"]
+        )
+        total_capacity += sum(
+            p["capacidade"] * 10
+            for p in self.catalog["packs_camisas"]
+        )
+
+        total_items = qty.get("peca_variada", 0) + qty.get("camisa", 0)
+        if total_items > total_capacity:
+            raise ValueError(f"Pedido muito grande ({total_items} itens). Capacidade máxima: {total_capacity}")
+
+    def _fill_packs(
+        self,
+        qty: Dict[str, int],
+        x: Dict[str, int],
+        y: Dict[str, int]
+    ) -> Tuple[Dict[str, int], int, int]:
+        """Camisas nos packs mistos e itens avulsos para os packs escolhidos.
+
+        Escolhe o total de camisas nos packs mistos que minimiza o custo dos
+        avulsos e, em empate, o menor; os packs mistos são preenchidos pela
+        ordem do catálogo. O custo nunca é superior ao da solução do solver.
+        """
+        mistos = self.catalog["packs_mistos"]
+        capacity = sum(p["capacidade"] * x[p["tipo"]] for p in mistos)
+        limit = sum(p["limite_camisas"] * x[p["tipo"]] for p in mistos)
+        shirts_left = max(0, qty["camisa"] - sum(
+            p["capacidade"] * y[p["tipo"]] for p in self.catalog["packs_camisas"]
+        ))
+
+        def loose(total):
+            return max(0, qty["peca_variada"] - capacity + total), max(0, shirts_left - total)
+
+        def loose_cost(total):
+            a_var, a_cam = loose(total)
+            return round(
+                self.catalog["avulso"]["peca_variada"] * a_var +
+                self.catalog["avulso"]["camisa"] * a_cam, 6
+            )
+
+        # Custo convexo e linear por troços: o mínimo está num dos extremos
+        candidates = {0, limit, min(shirts_left, limit),
+                      min(max(0, capacity - qty["peca_variada"]), limit)}
+        total = min(sorted(candidates), key=loose_cost)
+
+        s, remaining = {}, total
+        for p in mistos:
+            s[p["tipo"]] = min(remaining, p["limite_camisas"] * x[p["tipo"]])
+            remaining -= s[p["tipo"]]
+        return (s, *loose(total))
 
 # --------------------------------------------------------------------------- #
 #  INTERFACE DE USO
@@ -228,28 +332,37 @@ def optimizar_pedido(items: Dict[str, int]) -> Tuple[float, Dict[str, Any], Dict
 # --------------------------------------------------------------------------- #
 #  HANDLER PARA CHATGPT ACTIONS
 # --------------------------------------------------------------------------- #
-def gpt_optimize_handler(items: Dict[str, int]) -> Dict[str, Any]:
+def optimize_items(items: Dict[str, int], solver_pool: Any = None) -> Tuple[float, Dict[str, Any], Dict[str, Any]]:
+    """Otimiza no pool de solvers, se existir, ou no processo atual."""
+    if solver_pool is not None:
+        return solver_pool.optimize(items)
+    return optimizar_pedido(items)
+
+def format_response(total: float, detalhes: Dict[str, Any]) -> Dict[str, Any]:
+    """Resposta de sucesso no padrão GPT Actions"""
+    # Função para converter tipos problemáticos recursivamente
+    def convert_types(obj):
+        if isinstance(obj, (np.floating, float)):
+            return float(round(obj, 2))
+        if isinstance(obj, (np.integer, int)):
+            return int(obj)
+        if isinstance(obj, dict):
+            return {k: convert_types(v) for k, v in obj.items()}
+        if isinstance(obj, list):
+            return [convert_types(item) for item in obj]
+        return obj
+
+    return {
+        "status": "sucesso",
+        "custo_total": round(total, 2),
+        "detalhes": convert_types(detalhes)
+    }
+
+def gpt_optimize_handler(items: Dict[str, int], solver_pool: Any = None) -> Dict[str, Any]:
     """Formata a resposta para o padrão GPT Actions"""
     try:
-        total, detalhes, _ = optimizar_pedido(items)
-        
-        # Função para converter tipos problemáticos recursivamente
-        def convert_types(obj):
-            if isinstance(obj, (np.floating, float)):
-                return float(round(obj, 2))
-            if isinstance(obj, (np.integer, int)):
-                return int(obj)
-            if isinstance(obj, dict):
-                return {k: convert_types(v) for k, v in obj.items()}
-            if isinstance(obj, list):
-                return [convert_types(item) for item in obj]
-            return obj
-        
-        return {
-            "status": "sucesso",
-            "custo_total": round(total, 2),
-            "detalhes": convert_types(detalhes)
-        }
+        total, detalhes, _ = optimize_items(items, solver_pool)
+        return format_response(total, detalhes)
     except Exception as e:
         return {
             "status": "erro",
@@ -0,0 +1,216 @@
+"""
+logging_pipeline.py
+===================
+Pipeline de logging assíncrono com registos estruturados (JSON).
+
+O thread do pedido apenas coloca o LogRecord numa fila limitada; a
+formatação e a escrita acontecem num QueueListener em segundo plano,
+arrancado por processo (também depois de um fork do Gunicorn).
+Se a fila estiver cheia o registo é descartado (e contado), pelo que o
+logging nunca bloqueia o pedido.
+
+Cada pedido tem um ID de correlação (cabeçalho X-Request-ID). O do
+/optimize é guardado junto do recibo e registado pelo /download_pdf
+como optimize_correlation_id, ligando os dois pedidos.
+"""
+
+from __future__ import annotations
+from contextvars import ContextVar
+from typing import Dict, Any
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import zlib
+
+# Contexto do pedido atual (um valor por thread/pedido)
+correlation_id_var: ContextVar[str | None] = ContextVar("correlation_id", default=None)
+receipt_id_var: ContextVar[str | None] = ContextVar("receipt_id", default=None)
+
+
+def bind_request(correlation_id: str | None, receipt_id: str | None = None) -> None:
+    """Associa o pedido atual a um ID de correlação e, opcionalmente, a um recibo."""
+    correlation_id_var.set(correlation_id)
+    receipt_id_var.set(receipt_id)
+
+
+def bind_receipt(receipt_id: str | None) -> None:
+    receipt_id_var.set(receipt_id)
+
+
+def get_correlation_id() -> str | None:
+    return correlation_id_var.get()
+
+# --------------------------------------------------------------------------- #
+#  FILTROS (executam no thread do pedido, antes de entrar na fila)
+# --------------------------------------------------------------------------- #
+class ContextFilter(logging.Filter):
+    """Copia o contexto do pedido para o registo."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.correlation_id = correlation_id_var.get()
+        record.receipt_id = receipt_id_var.get()
+        return True
+
+
+class InfoSamplingFilter(logging.Filter):
+    """Amostra registos INFO; WARNING e superiores passam sempre.
+
+    A decisão é determinística por ID de correlação, para que um pedido
+    amostrado tenha todos os seus registos INFO.
+    """
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = max(0.0, min(1.0, rate))
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno != logging.INFO or self.rate >= 1.0:
+            return True
+        correlation_id = getattr(record, "correlation_id", None)
+        if correlation_id:
+            return zlib.crc32(correlation_id.encode()) % 10000 < self.rate * 10000
+        return random.random() < self.rate
+
+# --------------------------------------------------------------------------- #
+#  HANDLER DE FILA NÃO BLOQUEANTE
+# --------------------------------------------------------------------------- #
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que descarta registos quando a fila está cheia.
+
+    Cada processo tem a sua fila e o seu QueueListener, criados no primeiro
+    registo: threads não sobrevivem a um fork (ex.: workers do Gunicorn),
+    por isso o estado herdado é descartado no filho. Se o listener não
+    puder arrancar, o registo é escrito de forma síncrona.
+    """
+
+    def __init__(self, output: logging.Handler, queue_size: int = 10000):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        self.output = output
+        self.queue_size = queue_size
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        # Estado por processo; no filho de um fork a fila e os locks herdados
+        # podem estar a meio de uma operação de uma thread que já não existe
+        self.queue = queue.Queue(maxsize=self.queue_size)
+        self.listener: logging.handlers.QueueListener | None = None
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._pid: int | None = None
+
+    def _listener_running(self) -> bool:
+        if self._pid == os.getpid() and self.listener is not None:
+            return True
+        with self._start_lock:
+            if self._pid != os.getpid() or self.listener is None:
+                listener = logging.handlers.QueueListener(
+                    self.queue, self.output, respect_handler_level=True
+                )
+                try:
+                    listener.start()
+                except RuntimeError:
+                    # Ex.: interpretador a terminar, sem threads novas
+                    return False
+                self.listener, self._pid = listener, os.getpid()
+                atexit.register(self.stop_listener)
+        return True
+
+    def stop_listener(self) -> None:
+        """Esvazia a fila e pára o listener deste processo."""
+        listener = self.listener
+        if listener is None or self._pid != os.getpid():
+            return
+        self.listener = None
+        try:
+            listener.stop()
+        except queue.Full:
+            pass
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # A formatação é adiada para o listener (fora do caminho do pedido)
+        return record
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if not self._listener_running():
+            self.output.handle(record)
+            return
+        super().emit(record)
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """Formata cada registo como uma linha JSON."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+                  + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for field in ("correlation_id", "receipt_id", "optimize_correlation_id"):
+            value = getattr(record, field, None)
+            if value:
+                payload[field] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+# --------------------------------------------------------------------------- #
+#  CONFIGURAÇÃO
+# --------------------------------------------------------------------------- #
+_queue_handler: NonBlockingQueueHandler | None = None
+
+
+def setup_logging(
+    level: int = logging.INFO,
+    info_sample_rate: float = 1.0,
+    queue_size: int = 10000
+) -> NonBlockingQueueHandler:
+    """Instala o pipeline assíncrono no logger raiz (idempotente)."""
+    global _queue_handler
+    if _queue_handler is not None:
+        return _queue_handler
+
+    # stderr: o stdout fica para a saída de bibliotecas nativas (ex.: solvers)
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter())
+
+    # O listener só arranca no primeiro registo de cada processo
+    _queue_handler = NonBlockingQueueHandler(output, queue_size)
+    _queue_handler.addFilter(ContextFilter())
+    _queue_handler.addFilter(InfoSamplingFilter(info_sample_rate))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+    return _queue_handler
+
+
+def logging_stats() -> Dict[str, Any]:
+    """Estado da fila de logging (para /health)."""
+    if _queue_handler is None:
+        return {"async": False}
+    return {
+        "async": _queue_handler.listener is not None and _queue_handler._pid == os.getpid(),
+        "queued": _queue_handler.queue.qsize(),
+        "dropped": _queue_handler.dropped
+    }
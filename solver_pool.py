@@ -0,0 +1,350 @@
+"""
+solver_pool.py
+==============
+Serviço de solver com um pool de processos persistentes ("quentes").
+
+Cada worker constrói uma única vez o modelo e o solver; por pedido só
+são atualizados os lados direitos (qty["camisa"], qty["peca_variada"]).
+Com highspy instalado o modelo vive em memória num highspy.Highs e cada
+pedido é apenas changeRowBounds + run, sem ficheiros nem subprocessos;
+caso contrário usa-se o LaundryModel com o CBC do PuLP dentro do worker.
+
+Uso:
+    python solver_pool.py --benchmark 50
+"""
+
+from __future__ import annotations
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Tuple, Any, List
+from pulp import getSolver
+from laundry_optimizer_final import LaundryOptimizer, LaundryModel, CATALOG
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import numpy as np
+
+# highspy é opcional; sem ele o pool usa o CBC do PuLP
+try:
+    import highspy
+except ImportError:
+    highspy = None
+
+HIGHS_BACKEND = "highspy"
+FALLBACK_SOLVER = "PULP_CBC_CMD"
+
+
+def pick_solver_name() -> str:
+    """Escolhe o melhor backend disponível localmente."""
+    return HIGHS_BACKEND if highspy is not None else FALLBACK_SOLVER
+
+# --------------------------------------------------------------------------- #
+#  MODELO EM MEMÓRIA (HIGHSPY)
+# --------------------------------------------------------------------------- #
+class HighsModel:
+    """Mesmo modelo do LaundryModel, construído uma vez num highspy.Highs.
+
+    Por pedido só mudam os limites inferiores das duas linhas de cobertura.
+    """
+
+    def __init__(self, catalog: dict = CATALOG):
+        if highspy is None:
+            raise RuntimeError("highspy não está instalado")
+        self.catalog = catalog
+        self.h = highspy.Highs()
+        self.h.setOptionValue("output_flag", False)
+        # Num modelo com ~10 variáveis a heurística feasibility jump domina o tempo de solve
+        self.h.setOptionValue("mip_heuristic_run_feasibility_jump", False)
+        inf = highspy.kHighsInf
+
+        # Colunas com os mesmos nomes das variáveis do LaundryModel
+        self.columns: list[str] = []
+        self.index: Dict[Tuple[str, str], int] = {}
+
+        def add_col(group: str, key: str, name: str, cost: float) -> None:
+            self.index[(group, key)] = len(self.columns)
+            self.columns.append(name)
+            self.h.addCol(cost, 0.0, inf, 0, np.array([], dtype=np.int32), np.array([], dtype=np.float64))
+
+        for p in catalog["packs_mistos"]:
+            add_col("x", p["tipo"], f"pack_misto_{p['tipo']}", p["preco"])
+        for p in catalog["packs_mistos"]:
+            add_col("s", p["tipo"], f"camisas_no_misto_{p['tipo']}", 0.0)
+        for p in catalog["packs_camisas"]:
+            add_col("y", p["tipo"], f"pack_camisa_{p['tipo']}", p["preco"])
+        add_col("a", "peca_variada", "pecas_variadas_avulsas", catalog["avulso"]["peca_variada"])
+        add_col("a", "camisa", "camisas_avulsas", catalog["avulso"]["camisa"])
+        for col in range(len(self.columns)):
+            self.h.changeColIntegrality(col, highspy.HighsVarType.kInteger)
+
+        def add_row(lower: float, upper: float, terms: Dict[int, float]) -> int:
+            self.h.addRow(
+                lower, upper, len(terms),
+                np.array(list(terms.keys()), dtype=np.int32),
+                np.array(list(terms.values()), dtype=np.float64)
+            )
+            return self.h.getNumRow() - 1
+
+        # Limite de camisas nos packs mistos: s - limite * x <= 0
+        for p in catalog["packs_mistos"]:
+            add_row(-inf, 0.0, {
+                self.index[("s", p["tipo"])]: 1.0,
+                self.index[("x", p["tipo"])]: -float(p["limite_camisas"]),
+            })
+
+        # Cobertura de camisas (limite inferior definido em solve)
+        cover_cam = {self.index[("s", p["tipo"])]: 1.0 for p in catalog["packs_mistos"]}
+        cover_cam.update({self.index[("y", p["tipo"])]: float(p["capacidade"]) for p in catalog["packs_camisas"]})
+        cover_cam[self.index[("a", "camisa")]] = 1.0
+        self.row_camisas = add_row(0.0, inf, cover_cam)
+
+        # Cobertura de peças variadas (limite inferior definido em solve)
+        cover_var = {}
+        for p in catalog["packs_mistos"]:
+            cover_var[self.index[("x", p["tipo"])]] = float(p["capacidade"])
+            cover_var[self.index[("s", p["tipo"])]] = -1.0
+        cover_var[self.index[("a", "peca_variada")]] = 1.0
+        self.row_pecas_variadas = add_row(0.0, inf, cover_var)
+
+        self._values: list[float] | None = None
+
+    def solve(self, qty: Dict[str, int], solver: Any = None) -> None:
+        """Resolve o modelo para as quantidades dadas (o argumento solver é ignorado)."""
+        inf = highspy.kHighsInf
+        self.h.changeRowBounds(self.row_camisas, float(qty["camisa"]), inf)
+        self.h.changeRowBounds(self.row_pecas_variadas, float(qty["peca_variada"]), inf)
+        self.h.run()
+        status = self.h.getModelStatus()
+        if status != highspy.HighsModelStatus.kOptimal:
+            self._values = None
+            raise RuntimeError(f"Erro no solver: {self.h.modelStatusToString(status)}")
+        # Variáveis inteiras: arredondar o ruído numérico do MIP
+        self._values = [float(round(v)) for v in self.h.getSolution().col_value]
+
+    def solution(self) -> Dict[str, Any] | None:
+        """Valores da última solução, no formato de LaundryModel.solution()."""
+        if self._values is None:
+            return None
+        values = self._values
+
+        def group(name: str) -> Dict[str, float]:
+            return {key: values[col] for (g, key), col in self.index.items() if g == name}
+
+        return {
+            "x": group("x"),
+            "s": group("s"),
+            "y": group("y"),
+            "a_var": values[self.index[("a", "peca_variada")]],
+            "a_cam": values[self.index[("a", "camisa")]],
+            "variables": dict(zip(self.columns, values))
+        }
+
+
+def build_model(catalog: dict, solver_name: str) -> Tuple[Any, Any]:
+    """Modelo reutilizável e solver para o backend indicado."""
+    if solver_name == HIGHS_BACKEND:
+        return HighsModel(catalog), None
+    return LaundryModel(catalog), getSolver(solver_name, msg=False)
+
+# --------------------------------------------------------------------------- #
+#  ESTADO DO WORKER (um por processo)
+# --------------------------------------------------------------------------- #
+_worker_optimizer: LaundryOptimizer | None = None
+_worker_template: Any = None
+_worker_solver: Any = None
+
+
+def _init_worker(catalog: dict, solver_name: str) -> None:
+    """Constrói o modelo e o solver uma única vez por processo."""
+    global _worker_optimizer, _worker_template, _worker_solver
+    _worker_optimizer = LaundryOptimizer(catalog)
+    _worker_template, _worker_solver = build_model(catalog, solver_name)
+
+
+def _solve_in_worker(items: Dict[str, int]) -> Tuple[Tuple[float, Dict[str, Any], Dict[str, Any]], float]:
+    """Resolve um pedido no worker e devolve o resultado e o tempo de solve."""
+    start = time.perf_counter()
+    result = _worker_optimizer.optimize_order(items, _worker_solver, template=_worker_template)
+    return result, time.perf_counter() - start
+
+# --------------------------------------------------------------------------- #
+#  POOL DE SOLVERS
+# --------------------------------------------------------------------------- #
+class SolverPool:
+    """Pool de workers de longa duração com o modelo MILP pré-construído."""
+
+    def __init__(
+        self,
+        workers: int = 2,
+        catalog: dict = CATALOG,
+        solver_name: str | None = None,
+        timeout: float = 30.0,
+        logger: logging.Logger | None = None
+    ):
+        self.workers = workers
+        self.catalog = catalog
+        self.solver_name = solver_name or pick_solver_name()
+        self.timeout = timeout
+        self.log = logger or logging.getLogger(__name__)
+        self._executor: ProcessPoolExecutor | None = None
+        self._pid: int | None = None
+        self._lock = threading.Lock()
+        self._solves = 0
+        self._solve_time = 0.0
+        self._roundtrip_time = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Criação preguiçosa e por processo: um executor herdado por fork
+        # (ex.: master do Gunicorn) não é utilizável no processo filho
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self.log.info(
+                    "Iniciando pool de solvers (%d workers, backend %s)",
+                    self.workers, self.solver_name
+                )
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.catalog, self.solver_name)
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _discard_executor(self, executor: ProcessPoolExecutor) -> None:
+        """Descarta um executor partido ou bloqueado; o próximo pedido cria outro."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        # Terminar workers bloqueados, senão o shutdown ficaria à espera deles.
+        # _processes é privado, mas é deliberado: o executor não expõe os
+        # workers e um worker bloqueado nunca chega a devolver o seu PID
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, items: Dict[str, int]) -> Tuple[Tuple[float, Dict[str, Any], Dict[str, Any]], float]:
+        executor = self._get_executor()
+        try:
+            future = executor.submit(_solve_in_worker, dict(items))
+        except RuntimeError as e:
+            # Partido, ou descartado por outro thread (timeout) depois de
+            # _get_executor: "cannot schedule new futures after shutdown"
+            self._discard_executor(executor)
+            raise BrokenProcessPool(str(e)) from e
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self.log.error("Solver excedeu %.1fs; a reiniciar o pool", self.timeout)
+            self._discard_executor(executor)
+            raise RuntimeError(f"Tempo limite do solver excedido ({self.timeout:.0f}s)")
+        except BrokenProcessPool:
+            self._discard_executor(executor)
+            raise
+        except CancelledError as e:
+            # Ainda em fila quando outro thread descartou o executor
+            self._discard_executor(executor)
+            raise BrokenProcessPool("Pedido cancelado com o pool descartado") from e
+
+    def optimize(self, items: Dict[str, int]) -> Tuple[float, Dict[str, Any], Dict[str, Any]]:
+        """Mesmo contrato de LaundryOptimizer.optimize_order, resolvido no pool."""
+        start = time.perf_counter()
+        try:
+            result, solve_time = self._submit(items)
+        except BrokenProcessPool:
+            # Um worker morreu ou o executor foi descartado: tentar uma vez num novo
+            self.log.warning("Pool de solvers partido; a recriar e a repetir o pedido")
+            result, solve_time = self._submit(items)
+        roundtrip = time.perf_counter() - start
+        with self._lock:
+            self._solves += 1
+            self._solve_time += solve_time
+            self._roundtrip_time += roundtrip
+        return result
+
+    def warm_up(self) -> None:
+        """Força o arranque de todos os workers antes do primeiro pedido."""
+        executor = self._get_executor()
+        futures = [executor.submit(_solve_in_worker, {"camisa": 1}) for _ in range(self.workers)]
+        for future in futures:
+            future.result(timeout=self.timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """Tempos médios por solve (ms); overhead = ida e volta - solve no worker."""
+        with self._lock:
+            n = self._solves
+            solve_ms = 1000 * self._solve_time / n if n else 0.0
+            roundtrip_ms = 1000 * self._roundtrip_time / n if n else 0.0
+        return {
+            "backend": self.solver_name,
+            "workers": self.workers,
+            "solves": n,
+            "solve_ms": round(solve_ms, 3),
+            "roundtrip_ms": round(roundtrip_ms, 3),
+            "overhead_ms": round(roundtrip_ms - solve_ms, 3)
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+# --------------------------------------------------------------------------- #
+#  COMPARAÇÃO COM O CAMINHO ATUAL
+# --------------------------------------------------------------------------- #
+def _time_per_solve(pedidos: List[Dict[str, int]], solve) -> float:
+    start = time.perf_counter()
+    for pedido in pedidos:
+        solve(pedido)
+    return 1000 * (time.perf_counter() - start) / len(pedidos)
+
+
+def benchmark(pedidos: List[Dict[str, int]], workers: int = 2) -> Dict[str, Any]:
+    """Compara o tempo por solve do caminho atual com o modelo em memória e o pool."""
+    optimizer = LaundryOptimizer()
+    cold_ms = _time_per_solve(pedidos, optimizer.optimize_order)
+
+    # Modelo reutilizado no próprio processo (sem ida e volta ao pool)
+    template, solver = build_model(CATALOG, pick_solver_name())
+    in_memory_ms = _time_per_solve(
+        pedidos, lambda pedido: optimizer.optimize_order(pedido, solver, template=template)
+    )
+
+    pool = SolverPool(workers=workers)
+    try:
+        pool.warm_up()
+        # Descontar os solves de aquecimento das estatísticas
+        pool._solves, pool._solve_time, pool._roundtrip_time = 0, 0.0, 0.0
+        for pedido in pedidos:
+            pool.optimize(pedido)
+        stats = pool.stats()
+    finally:
+        pool.shutdown()
+
+    return {
+        "pedidos": len(pedidos),
+        "atual_ms": round(cold_ms, 3),
+        "modelo_reutilizado": {"backend": pick_solver_name(), "ms": round(in_memory_ms, 3)},
+        "pool": stats,
+        "ganho_ms": round(cold_ms - stats["roundtrip_ms"], 3)
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s: %(message)s")
+
+    parser = argparse.ArgumentParser(description="Benchmark do pool de solvers")
+    parser.add_argument("--benchmark", type=int, default=50, help="Número de pedidos")
+    parser.add_argument("--workers", type=int, default=2, help="Número de workers")
+    args = parser.parse_args()
+
+    pedidos = [
+        {"peca_variada": (i * 7) % 80, "camisa": (i * 3) % 25}
+        for i in range(args.benchmark)
+    ]
+    print(json.dumps(benchmark(pedidos, workers=args.workers), indent=2, ensure_ascii=False))
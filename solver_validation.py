@@ -0,0 +1,368 @@
+"""
+solver_validation.py
+====================
+Validação diferencial do motor de preços entre backends de solver.
+
+Para cada catálogo (o CATALOG atual e catálogos aleatórios) varre pedidos
+(peca_variada, camisa) e compara, ponto a ponto:
+  - "exato": programação dinâmica independente do PuLP (oráculo);
+  - "atual": LaundryOptimizer.optimize_order com modelo novo por pedido;
+  - "highspy": o HighsModel em memória usado pelo pool de solvers;
+  - cada solver PuLP disponível, com o LaundryModel reutilizado.
+
+Qualquer diferença de custo, breakdown inviável (ex.: limite_camisas
+violado nos packs mistos) ou breakdown cujo preço não bate com o custo
+reportado é assinalada. Os solves MILP são distribuídos pelos cores.
+
+Por omissão a execução é limitada (segundos): varrimento exaustivo até
+pv + camisa <= 40, que cobre as combinações de packs mistos e o
+limite_camisas, mais uma amostra aleatória até 300 itens. O varrimento
+completo até total_capacity (~912 mil pedidos) é opcional. O
+test_solver_validation.py corre a versão limitada com o pytest.
+
+Uso:
+    python solver_validation.py               # verificação limitada
+    python solver_validation.py --completo    # varrimento exaustivo até total_capacity
+"""
+
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Tuple, Any, List
+from pulp import listSolvers, getSolver
+from laundry_optimizer_final import LaundryOptimizer, CATALOG
+from solver_pool import HIGHS_BACKEND, build_model, highspy
+import copy
+import json
+import logging
+import multiprocessing
+import numpy as np
+import os
+import random
+
+REFERENCE_BACKEND = "atual"
+EXACT_BACKEND = "exato"
+COST_TOLERANCE = 0.005  # custos são arredondados a cêntimos
+
+# Limites da execução por omissão (rápida o suficiente para cada alteração)
+DEFAULT_MAX_TOTAL = 40
+DEFAULT_SAMPLE = 100
+DEFAULT_SAMPLE_BOUND = 300
+DEFAULT_RANDOM_CATALOGS = 5
+
+
+def total_capacity(catalog: dict) -> int:
+    """Mesmo limite usado em LaundryOptimizer.optimize_order."""
+    return (
+        sum(p["capacidade"] * 10 for p in catalog["packs_mistos"]) +
+        sum(p["capacidade"] * 10 for p in catalog["packs_camisas"])
+    )
+
+
+def available_backends() -> List[str]:
+    """Caminho atual + um backend de modelo reutilizado por solver disponível."""
+    backends = [REFERENCE_BACKEND]
+    if highspy is not None:
+        backends.append(HIGHS_BACKEND)
+    return backends + listSolvers(onlyAvailable=True)
+
+# --------------------------------------------------------------------------- #
+#  ORÁCULO EXATO (PROGRAMAÇÃO DINÂMICA, SEM PULP)
+# --------------------------------------------------------------------------- #
+def exact_costs(catalog: dict, max_total: int) -> np.ndarray:
+    """Custo mínimo F[pv, c] para cobrir pv peças variadas e c camisas.
+
+    Cada pack misto com j camisas (j <= limite_camisas) cobre
+    (capacidade - j) peças variadas e j camisas; os packs de camisas e as
+    peças avulsas cobrem só o respetivo tipo. Só são calculados os pontos
+    com pv + c <= max_total.
+    """
+    price_var = catalog["avulso"]["peca_variada"]
+    price_cam = catalog["avulso"]["camisa"]
+    mixed = [
+        (p["capacidade"], min(p["limite_camisas"], p["capacidade"]), p["preco"])
+        for p in catalog["packs_mistos"]
+    ]
+    shirts = [(p["capacidade"], p["preco"]) for p in catalog["packs_camisas"]]
+
+    F = np.full((max_total + 1, max_total + 1), np.inf)
+    for pv in range(max_total + 1):
+        width = max_total + 1 - pv
+        idx = np.arange(width)
+        base = np.full(width, np.inf)
+        if pv == 0:
+            base[0] = 0.0
+        else:
+            # Transições a partir de linhas já calculadas (pv menor)
+            base = np.minimum(base, F[pv - 1, :width] + price_var)
+            for capacity, limit, price in mixed:
+                for j in range(limit + 1):
+                    if capacity - j <= 0:
+                        continue
+                    prev = F[max(0, pv - (capacity - j))]
+                    base = np.minimum(base, prev[np.maximum(0, idx - j)] + price)
+
+        # Transições dentro da linha (só camisas), em ordem crescente de c
+        row = base.tolist()
+        for c in range(1, width):
+            best = min(row[c], row[c - 1] + price_cam)
+            for capacity, price in shirts:
+                best = min(best, row[max(0, c - capacity)] + price)
+            for capacity, limit, price in mixed:
+                # Com pv == 0 (ou pack só de camisas) o pack misto fica na linha
+                for j in range(1, limit + 1):
+                    if pv == 0 or capacity - j == 0:
+                        best = min(best, row[max(0, c - j)] + price)
+            row[c] = best
+        F[pv, :width] = row
+    return F
+
+# --------------------------------------------------------------------------- #
+#  VERIFICAÇÃO DE BREAKDOWNS
+# --------------------------------------------------------------------------- #
+def check_breakdown(catalog: dict, order: Dict[str, int], total: float, breakdown: Dict[str, Any]) -> str | None:
+    """Devolve a descrição do problema, ou None se o breakdown for válido."""
+    mixed = {p["tipo"]: p for p in catalog["packs_mistos"]}
+    shirts = {p["tipo"]: p for p in catalog["packs_camisas"]}
+    x = breakdown.get("packs_mistos", {})
+    s = breakdown.get("camisas_em_packs_mistos", {})
+    y = breakdown.get("packs_camisas", {})
+    avulsos = breakdown.get("itens_avulsos", {})
+
+    for tipo, camisas in s.items():
+        if camisas > mixed[tipo]["limite_camisas"] * x.get(tipo, 0):
+            return f"limite_camisas excedido no pack misto {tipo}"
+
+    covered_cam = sum(s.values()) + sum(shirts[t]["capacidade"] * n for t, n in y.items()) + avulsos.get("camisa", 0)
+    if covered_cam < order["camisa"]:
+        return f"camisas por cobrir ({covered_cam} < {order['camisa']})"
+
+    covered_var = sum(mixed[t]["capacidade"] * n for t, n in x.items()) - sum(s.values()) + avulsos.get("peca_variada", 0)
+    if covered_var < order["peca_variada"]:
+        return f"peças variadas por cobrir ({covered_var} < {order['peca_variada']})"
+
+    priced = (
+        sum(mixed[t]["preco"] * n for t, n in x.items()) +
+        sum(shirts[t]["preco"] * n for t, n in y.items()) +
+        catalog["avulso"]["peca_variada"] * avulsos.get("peca_variada", 0) +
+        catalog["avulso"]["camisa"] * avulsos.get("camisa", 0)
+    )
+    if abs(round(priced, 2) - total) > COST_TOLERANCE:
+        return f"preço do breakdown ({priced:.2f}) difere do custo reportado ({total:.2f})"
+    return None
+
+# --------------------------------------------------------------------------- #
+#  WORKERS (um modelo reutilizado por catálogo e solver, por processo)
+# --------------------------------------------------------------------------- #
+_worker_models: Dict[Tuple[str, str], Tuple[Any, Any]] = {}
+_worker_solvers: Dict[str, Any] = {}
+
+
+def _init_worker() -> None:
+    logging.basicConfig(level=logging.WARNING)
+    # O wrapper HiGHS do PuLP ignora msg=False e escreve no fd 1; o stdout
+    # do processo principal fica só para o relatório JSON
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+
+
+def _solver(name: str) -> Any:
+    if name not in _worker_solvers:
+        _worker_solvers[name] = getSolver(name, msg=False)
+    return _worker_solvers[name]
+
+
+def _check_chunk(
+    catalog: dict,
+    backend: str,
+    points: List[Tuple[int, int]]
+) -> List[Tuple[int, int, float | None, str | None]]:
+    """Resolve uma lista de pontos num backend; devolve (pv, c, custo, problema)."""
+    optimizer = LaundryOptimizer(catalog)
+    if backend == REFERENCE_BACKEND:
+        # Caminho atual: modelo novo por pedido com o CBC por omissão (sem output)
+        solver, template = _solver("PULP_CBC_CMD"), None
+    else:
+        key = (json.dumps(catalog, sort_keys=True), backend)
+        if key not in _worker_models:
+            _worker_models[key] = build_model(catalog, backend)
+        template, solver = _worker_models[key]
+
+    results = []
+    for pv, c in points:
+        order = {"peca_variada": pv, "camisa": c}
+        try:
+            total, breakdown, _ = optimizer.optimize_order(order, solver, template=template)
+        except Exception as e:
+            results.append((pv, c, None, f"erro: {e}"))
+            continue
+        results.append((pv, c, total, check_breakdown(catalog, order, total, breakdown)))
+    return results
+
+# --------------------------------------------------------------------------- #
+#  CATÁLOGOS ALEATÓRIOS
+# --------------------------------------------------------------------------- #
+def random_catalog(rng: random.Random) -> dict:
+    """Catálogo com a estrutura do CATALOG e packs/preços aleatórios."""
+    catalog = copy.deepcopy(CATALOG)
+    catalog["packs_mistos"] = []
+    for capacity in sorted(rng.sample(range(5, 65, 5), rng.randint(1, 3))):
+        catalog["packs_mistos"].append({
+            "tipo": str(capacity),
+            "capacidade": capacity,
+            "limite_camisas": rng.randint(0, capacity // 2),
+            "preco": round(capacity * rng.uniform(0.5, 1.0), 2),
+        })
+    catalog["packs_camisas"] = []
+    for capacity in sorted(rng.sample(range(2, 16), rng.randint(1, 2))):
+        catalog["packs_camisas"].append({
+            "tipo": str(capacity),
+            "capacidade": capacity,
+            "preco": round(capacity * rng.uniform(1.0, 1.8), 2),
+        })
+    catalog["avulso"]["peca_variada"] = round(rng.uniform(0.5, 1.5), 2)
+    catalog["avulso"]["camisa"] = round(rng.uniform(1.0, 2.5), 2)
+    return catalog
+
+# --------------------------------------------------------------------------- #
+#  HARNESS
+# --------------------------------------------------------------------------- #
+def sweep_points(max_total: int) -> List[Tuple[int, int]]:
+    """Todos os pedidos (pv, c) não vazios com pv + c <= max_total."""
+    return [
+        (pv, c)
+        for pv in range(max_total + 1)
+        for c in range(max_total + 1 - pv)
+        if pv + c > 0
+    ]
+
+
+def validate_catalog(
+    executor: ProcessPoolExecutor,
+    catalog: dict,
+    points: List[Tuple[int, int]],
+    backends: List[str],
+    chunk_size: int = 200
+) -> List[Dict[str, Any]]:
+    """Compara todos os backends com o oráculo exato e com o caminho atual."""
+    exact = exact_costs(catalog, max(pv + c for pv, c in points))
+
+    futures = {
+        backend: [
+            executor.submit(_check_chunk, catalog, backend, points[i:i + chunk_size])
+            for i in range(0, len(points), chunk_size)
+        ]
+        for backend in backends
+    }
+    costs: Dict[str, Dict[Tuple[int, int], float | None]] = {}
+    disagreements = []
+    for backend, chunks in futures.items():
+        costs[backend] = {}
+        for future in chunks:
+            for pv, c, total, problem in future.result():
+                costs[backend][(pv, c)] = total
+                if problem:
+                    disagreements.append({"backend": backend, "pedido": (pv, c), "problema": problem})
+
+    for pv, c in points:
+        expected = round(float(exact[pv, c]), 2)
+        for backend in backends:
+            total = costs[backend][(pv, c)]
+            if total is not None and abs(total - expected) > COST_TOLERANCE:
+                disagreements.append({
+                    "backend": backend,
+                    "pedido": (pv, c),
+                    "problema": f"custo {total:.2f} != exato {expected:.2f}"
+                })
+    return disagreements
+
+
+def sample_points(
+    rng: random.Random,
+    count: int,
+    bound: int,
+    exclude: set | None = None
+) -> List[Tuple[int, int]]:
+    """Amostra pedidos distintos com 0 < pv + c <= bound (fora de exclude)."""
+    exclude = exclude or set()
+    candidates = [p for p in sweep_points(bound) if p not in exclude]
+    return sorted(rng.sample(candidates, min(count, len(candidates))))
+
+
+def run(
+    max_total: int = DEFAULT_MAX_TOTAL,
+    random_catalogs: int = DEFAULT_RANDOM_CATALOGS,
+    sample: int = DEFAULT_SAMPLE,
+    sample_bound: int = DEFAULT_SAMPLE_BOUND,
+    full: bool = False,
+    backends: List[str] | None = None,
+    workers: int | None = None,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """Executa a validação e devolve um resumo com as divergências.
+
+    Com full=True o CATALOG é varrido exaustivamente até total_capacity
+    (horas de CPU); caso contrário até max_total, mais `sample` pedidos
+    aleatórios até sample_bound.
+    """
+    backends = backends or available_backends()
+    rng = random.Random(seed)
+
+    if full:
+        points = sweep_points(total_capacity(CATALOG))
+    else:
+        points = sweep_points(max_total)
+        bound = min(sample_bound, total_capacity(CATALOG))
+        points = sorted(points + sample_points(rng, sample, bound, set(points)))
+    catalogs = [("CATALOG", CATALOG, points)]
+
+    for n in range(random_catalogs):
+        catalog = random_catalog(rng)
+        bound = min(sample_bound, total_capacity(catalog))
+        catalogs.append((f"aleatorio_{n}", catalog, sample_points(rng, sample, bound)))
+
+    report = {"backends": [EXACT_BACKEND] + backends, "catalogos": [], "divergencias": []}
+    with ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count(),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker
+    ) as executor:
+        for name, catalog, points in catalogs:
+            found = validate_catalog(executor, catalog, points, backends)
+            report["catalogos"].append({"nome": name, "pedidos": len(points), "divergencias": len(found)})
+            for item in found:
+                item["catalogo"] = name
+                if name != "CATALOG":
+                    item["detalhe_catalogo"] = catalog
+            report["divergencias"].extend(found)
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s: %(message)s")
+
+    parser = argparse.ArgumentParser(description="Validação diferencial dos backends de solver")
+    parser.add_argument("--max-total", type=int, default=DEFAULT_MAX_TOTAL, help="Limite do varrimento exaustivo de pv + camisa")
+    parser.add_argument("--completo", action="store_true", help="Varrimento exaustivo até total_capacity (lento)")
+    parser.add_argument("--catalogos", type=int, default=DEFAULT_RANDOM_CATALOGS, help="Número de catálogos aleatórios")
+    parser.add_argument("--amostra", type=int, default=DEFAULT_SAMPLE, help="Pedidos aleatórios por catálogo")
+    parser.add_argument("--limite-amostra", type=int, default=DEFAULT_SAMPLE_BOUND, help="Limite de pv + camisa na amostra")
+    parser.add_argument("--backends", type=str, help="Lista separada por vírgulas (omissão: todos os disponíveis)")
+    parser.add_argument("--workers", type=int, help="Processos em paralelo (omissão: nº de cores)")
+    parser.add_argument("--seed", type=int, default=0, help="Semente dos catálogos aleatórios")
+    args = parser.parse_args()
+
+    report = run(
+        max_total=args.max_total,
+        random_catalogs=args.catalogos,
+        sample=args.amostra,
+        sample_bound=args.limite_amostra,
+        full=args.completo,
+        backends=args.backends.split(",") if args.backends else None,
+        workers=args.workers,
+        seed=args.seed
+    )
+    print(json.dumps(report, indent=2, ensure_ascii=False, default=str))
+    sys.exit(1 if report["divergencias"] else 0)
@@ -0,0 +1,130 @@
+"""Testes do endpoint /quote (corre com pytest)."""
+
+import json
+
+import pytest
+
+import app as api
+from logging_pipeline import get_correlation_id
+from solver_pool import SolverPool
+
+
+@pytest.fixture
+def client():
+    api.quote_body.cache_clear()
+    api.encoded_quote_body.cache_clear()
+    yield api.app.test_client()
+    api.quote_body.cache_clear()
+    api.encoded_quote_body.cache_clear()
+
+
+def test_quote_body_same_with_and_without_pool(client, monkeypatch):
+    # 12 variadas + 4 camisas: CBC punha 5 camisas no pack de 20, HiGHS 4
+    urls = [
+        "/quote?camisa=4&peca_variada=12",
+        "/quote?camisa=10&peca_variada=10",
+        "/quote?camisa=8&peca_variada=15",
+        "/quote?blazer=2&camisa=23&peca_variada=41",
+    ]
+    monkeypatch.setattr(api, "solver_pool", None)
+    without_pool = [client.get(url).get_data() for url in urls]
+
+    api.quote_body.cache_clear()
+    api.encoded_quote_body.cache_clear()
+    pool = SolverPool(workers=1)
+    try:
+        monkeypatch.setattr(api, "solver_pool", pool)
+        with_pool = [client.get(url).get_data() for url in urls]
+    finally:
+        pool.shutdown()
+
+    assert with_pool == without_pool
+    assert json.loads(without_pool[0])["detalhes"]["camisas_em_packs_mistos"] == {"20": 4}
+
+
+def test_quote_rejects_invalid_orders_with_400(client):
+    assert client.get("/quote?meia=3").status_code == 400
+    assert client.get("/quote?camisa=-1").status_code == 400
+    # Acima da capacidade: rejeitado antes de chamar o solver
+    response = client.get("/quote?camisa=1000&peca_variada=1000")
+    assert response.status_code == 400
+    assert "Capacidade" in response.get_json()["mensagem"]
+
+
+def test_quote_solver_failure_is_500_and_not_cached(client, monkeypatch):
+    class BrokenPool:
+        def optimize(self, items):
+            raise RuntimeError("Tempo limite do solver excedido (30s)")
+
+    monkeypatch.setattr(api, "solver_pool", BrokenPool())
+    response = client.get("/quote?camisa=8&peca_variada=15")
+    assert response.status_code == 500
+    assert "Cache-Control" not in response.headers
+
+    monkeypatch.setattr(api, "solver_pool", None)
+    assert client.get("/quote?camisa=8&peca_variada=15").status_code == 200
+
+
+def test_quote_redirects_to_canonical_url(client):
+    response = client.get("/quote?peca_variada=15&camisa=08&blazer=0")
+    assert response.status_code == 301
+    assert response.headers["Location"].endswith("/quote?camisa=8&peca_variada=15")
+    assert response.cache_control.public
+
+
+def test_quote_not_modified_on_matching_etag(client):
+    first = client.get("/quote?camisa=8&peca_variada=15")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+
+    second = client.get("/quote?camisa=8&peca_variada=15", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.get_data() == b""
+    assert second.headers["ETag"] == etag
+
+
+def test_quote_etag_per_encoding(client):
+    url = "/quote?camisa=8&peca_variada=15"
+    plain = client.get(url)
+    gzipped = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    assert "Content-Encoding" not in plain.headers
+    assert gzipped.headers["ETag"] != plain.headers["ETag"]
+
+    # A ETag de uma codificação não valida a outra
+    response = client.get(url, headers={"If-None-Match": plain.headers["ETag"], "Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+
+
+def test_cacheable_responses_vary_on_encoding(client):
+    for url in ("/quote?camisa=8&peca_variada=15", "/catalog"):
+        response = client.get(url)
+        assert response.headers["Vary"] == "Accept-Encoding"
+        assert response.cache_control.public
+
+
+def test_request_id_only_on_private_responses(client):
+    headers = {"X-Request-ID": "pedido-123"}
+    for url in ("/quote?camisa=8&peca_variada=15", "/quote?peca_variada=15&camisa=8", "/catalog"):
+        assert "X-Request-ID" not in client.get(url, headers=headers).headers
+
+    etag = client.get("/catalog").headers["ETag"]
+    not_modified = client.get("/catalog", headers={**headers, "If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert "X-Request-ID" not in not_modified.headers
+
+    assert client.get("/health", headers=headers).headers["X-Request-ID"] == "pedido-123"
+
+
+def test_download_pdf_keeps_its_own_request_id(client):
+    created = client.post("/optimize", json={"camisa": 8}, headers={"X-Request-ID": "optimize-1"})
+    receipt_id = created.get_json()["pdf_url"].rsplit("/", 1)[1]
+
+    response = client.get(f"/download_pdf/{receipt_id}", headers={"X-Request-ID": "pdf-1"})
+    assert response.status_code == 200
+    assert response.headers["X-Request-ID"] == "pdf-1"
+
+
+def test_request_context_cleared_after_request(client):
+    client.get("/health", headers={"X-Request-ID": "pedido-456"})
+    assert get_correlation_id() is None
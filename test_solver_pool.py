@@ -0,0 +1,17 @@
+"""Testes de recuperação do pool de solvers (corre com pytest)."""
+
+from solver_pool import SolverPool
+
+
+def test_optimize_retries_after_executor_shut_down_by_other_thread():
+    pool = SolverPool(workers=1)
+    try:
+        # Simula outro thread a descartar o executor entre _get_executor e submit
+        stale = pool._get_executor()
+        stale.shutdown()
+
+        total, detalhes, _ = pool.optimize({"camisa": 8, "peca_variada": 15})
+        assert total > 0 and detalhes["packs_mistos"]
+        assert pool._executor is not stale
+    finally:
+        pool.shutdown()
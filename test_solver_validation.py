@@ -0,0 +1,38 @@
+"""Validação diferencial limitada do motor de preços (corre com pytest)."""
+
+import copy
+
+from laundry_optimizer_final import CATALOG
+import solver_validation
+
+
+def test_backends_agree_with_exact_costs():
+    report = solver_validation.run(
+        max_total=20,
+        random_catalogs=2,
+        sample=15,
+        sample_bound=80,
+        workers=2
+    )
+    assert report["divergencias"] == []
+    assert all(c["pedidos"] > 0 for c in report["catalogos"])
+
+
+def test_exact_costs_respect_limite_camisas():
+    # 10 variadas + 10 camisas: com limite 5 no pack de 20 não chega um pack
+    relaxed = copy.deepcopy(CATALOG)
+    relaxed["packs_mistos"][0]["limite_camisas"] = 20
+    assert solver_validation.exact_costs(CATALOG, 20)[10, 10] > 16.0
+    assert solver_validation.exact_costs(relaxed, 20)[10, 10] == 16.0
+
+
+def test_check_breakdown_flags_limite_camisas():
+    breakdown = {
+        "packs_mistos": {"20": 1},
+        "camisas_em_packs_mistos": {"20": 10},
+        "packs_camisas": {},
+        "itens_avulsos": {"peca_variada": 0, "camisa": 0},
+    }
+    order = {"peca_variada": 10, "camisa": 10}
+    problem = solver_validation.check_breakdown(CATALOG, order, 16.0, breakdown)
+    assert problem is not None and "limite_camisas" in problem